@@ -1,9 +1,18 @@
 import network
-import urequests
+import socket
+import ssl
+import io
 import machine
 import time
 import gc
-from math import sqrt
+from array import array
+from micropython import const
+from sensors import (PITOT_ADDR, pitot_i2c, pitot_read_status, parse_pitot_counts,
+                     counts_to_cpa, airspeed_cms, centi_str)
+
+# Per-batch status output; prints block the loop on USB, so only failures are
+# reported unless this is set
+DEBUG = const(0)
 
 # --- GPS setup (same as logger.py) ---
 from micropyGPS import MicropyGPS
@@ -25,68 +34,148 @@ def connect_wifi(ssid, password):
 
 connect_wifi("UCLA_RES_IOT", "RvE{7;?{")
 
-url = "https://airfq-api.vercel.app/publish"
+API_HOST = "airfq-api.vercel.app"
+API_PATH = "/publish"
+API_ADDR = socket.getaddrinfo(API_HOST, 443)[0][-1]
+
+# Batches are gzipped when the firmware's deflate module can compress
+# (MICROPY_PY_DEFLATE_COMPRESS); otherwise they go out as plain JSON
+try:
+    import deflate
+    with deflate.DeflateIO(io.BytesIO(), deflate.GZIP) as gz:
+        gz.write(b"{}")
+    GZIP_BODY = True
+except Exception:
+    GZIP_BODY = False
+
+def gzip_body(body):
+    out = io.BytesIO()
+    with deflate.DeflateIO(out, deflate.GZIP) as gz:
+        gz.write(body)
+    return out.getvalue()
+
+REQUEST_HEAD = (
+    "POST " + API_PATH + " HTTP/1.1\r\n"
+    "Host: " + API_HOST + "\r\n"
+    "Content-Type: application/json\r\n"
+    + ("Content-Encoding: gzip\r\n" if GZIP_BODY else "") +
+    "Connection: keep-alive\r\n"
+    "Content-Length: %d\r\n\r\n"
+)
+
+# One TLS connection is kept open across batches and only re-opened on error,
+# so the handshake is not paid for every POST
+api_sock = None
+
+def api_connect():
+    sock = socket.socket()
+    sock.connect(API_ADDR)
+    return ssl.wrap_socket(sock, server_hostname=API_HOST)
+
+def read_response(sock):
+    # Consume status, headers and body so the connection can be reused
+    status = int(sock.readline().split(None, 2)[1])
+    length = 0
+    chunked = False
+    keep_alive = True
+    while True:
+        line = sock.readline().decode()
+        if not line or line == "\r\n":
+            break
+        name, _, value = line.partition(":")
+        name = name.strip().lower()
+        value = value.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding":
+            chunked = value == "chunked"
+        elif name == "connection":
+            keep_alive = value != "close"
+    if chunked:
+        while True:
+            size = int(sock.readline().split(b";")[0], 16)
+            sock.read(size + 2)  # chunk data plus trailing CRLF
+            if size == 0:
+                break
+    elif length:
+        sock.read(length)
+    return status, keep_alive
+
+def post_json(body):
+    global api_sock
+    # An idle kept-alive socket may have been closed by the server or a load
+    # balancer, which only shows on the next write/read; a failure on a reused
+    # socket is retried once on a fresh connection
+    while True:
+        reused = api_sock is not None
+        if not reused:
+            api_sock = api_connect()
+        try:
+            api_sock.write((REQUEST_HEAD % len(body)).encode())
+            api_sock.write(body)
+            status, keep_alive = read_response(api_sock)
+        except Exception:
+            api_sock.close()
+            api_sock = None
+            if reused:
+                continue
+            raise
+        if not keep_alive:
+            api_sock.close()
+            api_sock = None
+        return status
 
 # I2C setup for pitot sensor (0x28)
-PITOT_ADDR = 0x28
 sda = machine.Pin(8)
 scl = machine.Pin(9)
-i2c = machine.I2C(0, sda=sda, scl=scl, freq=400000)
+i2c = pitot_i2c(sda, scl)
+# Reused by every 4-byte pitot read so the driver does not allocate per sample
+pitot_buf = bytearray(4)
 
 # Calibration for zero offset
 zero_offset = 0
-calibration_readings = []
 calibration_count = 5
+calibration_readings = array('i', [0] * calibration_count)
+calibration_len = 0
 calibrated = False
 
-def parse_pitot_data(data):
-    if len(data) != 4:
-        return None, None
-    pressure_raw = (data[0] << 8) | data[1]
-    temp_raw = (data[2] << 8) | data[3]
-    return pressure_raw, temp_raw
-
-def raw_to_pressure_pa(pressure_raw):
-    # Example conversion for Honeywell sensor (adjust for your sensor)
-    # Output: 1638 (min) to 14745 (max) = 0 to 1 psi
-    # 1 psi = 6894.76 Pa
-    if pressure_raw < 1638:
-        pressure_raw = 1638
-    if pressure_raw > 14745:
-        pressure_raw = 14745
-    psi = (pressure_raw - 1638) * (1.0 / (14745 - 1638))
-    return psi * 6894.76
-
-def airspeed_from_pressures(pressure_diff_pa):
-    # Calculate airspeed in m/s from differential pressure
-    # v = sqrt(2 * dp / rho)
-    # Assume rho = 1.225 kg/m^3 (sea level, 15°C)
-    if pressure_diff_pa is None or pressure_diff_pa < 0:
-        return 0
-    rho = 1.225
-    return sqrt(2 * pressure_diff_pa / rho)
-
 # Calibrate pitot sensor at rest
 print("Calibrating pitot sensor... Keep at rest.")
 while not calibrated:
     try:
-        pitot_data = i2c.readfrom(PITOT_ADDR, 4)
-        pressure_raw, _ = parse_pitot_data(pitot_data)
-        if pressure_raw is not None:
-            pressure_pa = raw_to_pressure_pa(pressure_raw)
-            calibration_readings.append(pressure_pa)
-            print("Calibration reading {}: {:.2f} Pa".format(len(calibration_readings), pressure_pa))
-            if len(calibration_readings) >= calibration_count:
-                zero_offset = sum(calibration_readings) / len(calibration_readings)
-                calibrated = True
-                print("Calibration complete. Zero offset: {:.2f} Pa".format(zero_offset))
+        i2c.readfrom_into(PITOT_ADDR, pitot_buf)
+        counts = parse_pitot_counts(pitot_buf)
+        calibration_readings[calibration_len] = counts
+        calibration_len += 1
+        print("Calibration reading {}: {} Pa".format(calibration_len, centi_str(counts_to_cpa(counts))))
+        if calibration_len >= calibration_count:
+            # Zero offset is kept in sensor counts
+            zero_offset = sum(calibration_readings) // calibration_count
+            calibrated = True
+            print("Calibration complete. Zero offset: {} Pa".format(centi_str(counts_to_cpa(zero_offset))))
     except Exception as e:
         print("Calibration error:", e)
     time.sleep(0.1)
 
 # --- Batch send after 10 samples ---
-batch = []
-sample_interval = 0.1  # 100 ms (in seconds)
+# The {"data": [...]} body is built in place in one preallocated buffer: each
+# sample appends its JSON object and a comma, and on send the last comma is
+# turned into "]}". Room for 10 items of up to 43 bytes each.
+BATCH_SIZE = 10
+BATCH_HEAD = b'{"data":['
+batch_buf = bytearray(512)
+batch_buf[:len(BATCH_HEAD)] = BATCH_HEAD
+batch_mv = memoryview(batch_buf)
+batch_blen = len(BATCH_HEAD)
+batch_len = 0
+
+# Let the runtime collect after a quarter of the free heap has been
+# allocated, and only force a collection when the heap runs low
+GC_MIN_FREE = 8192
+gc.collect()
+gc.threshold(gc.mem_free() // 4)
+
+sample_interval_ms = 100
 last_sample_time = time.ticks_ms()  # Millisecond counter
 
 # Initialize timestamp relative to start
@@ -96,20 +185,23 @@ while True:
     now = time.ticks_ms()
 
     # Sample exactly every 100 ms
-    if time.ticks_diff(now, last_sample_time) >= int(sample_interval * 1000):
+    if time.ticks_diff(now, last_sample_time) >= sample_interval_ms:
         # Always update GPS parser
-        while gps_serial.any():
-            c = gps_serial.read(1)
-            if c:
-                my_gps.update(chr(c[0]))
+        n = gps_serial.any()
+        if n:
+            data = gps_serial.read(n)
+            if data:
+                gps_update = my_gps.update
+                for b in data:
+                    gps_update(chr(b))
 
         try:
-            pitot_data = i2c.readfrom(PITOT_ADDR, 4)
-            pressure_raw, temp_raw = parse_pitot_data(pitot_data)
-            pitot_pa = raw_to_pressure_pa(pressure_raw) if pressure_raw is not None else None
-            if pitot_pa is not None:
-                pitot_pa -= zero_offset
-            airspeed = airspeed_from_pressures(pitot_pa) if pitot_pa is not None else None
+            # Still stale after the retries, or a sensor fault: sent as "" like
+            # a failed read rather than uploading a bad value
+            if pitot_read_status(pitot_buf):
+                airspeed = None
+            else:
+                airspeed = airspeed_cms(parse_pitot_counts(pitot_buf) - zero_offset)
         except Exception as e:
             print("Pitot read error:", e)
             airspeed = None
@@ -117,25 +209,34 @@ while True:
         # Record timestamp relative to start (ms)
         timestamp = time.ticks_diff(now, t_start)
 
-        batch.append({
-            "timestamp": timestamp,
-            "airspeed": airspeed if airspeed is not None else ""
-        })
+        item = ('{"timestamp":%d,"airspeed":%s},' % (
+            timestamp, centi_str(airspeed) if airspeed is not None else '""'
+        )).encode()
+        batch_mv[batch_blen:batch_blen + len(item)] = item
+        batch_blen += len(item)
+        batch_len += 1
 
         last_sample_time = now  # Update last sample time
 
     # Send batch when we have 10 samples
-    if len(batch) >= 10:
-        data = {"data": batch}
+    if batch_len >= BATCH_SIZE:
         try:
-            resp = urequests.post(url, json=data)
-            resp.close()
-            del resp
-            print("Sent batch of 10 readings")
+            batch_buf[batch_blen - 1] = ord("]")
+            batch_buf[batch_blen] = ord("}")
+            body = batch_mv[:batch_blen + 1]
+            status = post_json(gzip_body(body) if GZIP_BODY else body)
+            if DEBUG or status != 200:
+                print("Sent batch of 10 readings:", status)
         except Exception as e:
             print("POST error:", e)
 
-        batch = []  # Clear batch after sending
-        gc.collect()
+        # Clear batch after sending
+        batch_blen = len(BATCH_HEAD)
+        batch_len = 0
+        if gc.mem_free() < GC_MIN_FREE:
+            gc.collect()
 
-    time.sleep(0.005)  # Tiny sleep to avoid busy waiting
+    # Sleep until the next sample is due rather than waking every 5 ms
+    wait_ms = sample_interval_ms - time.ticks_diff(time.ticks_ms(), last_sample_time)
+    if wait_ms > 0:
+        time.sleep_ms(wait_ms)
@@ -0,0 +1,6 @@
+# Freezes the shared flight-unit modules into a custom Pico W firmware so
+# their bytecode runs from flash instead of being compiled into RAM at import
+include("$(PORT_DIR)/boards/RPI_PICO_W/manifest.py")
+
+module("sensors.py", opt=3)
+module("micropyGPS.py", opt=3)
@@ -0,0 +1,147 @@
+# Pitot tube and onboard sensor helpers shared by logger.py, main.py and airspeed.py
+
+import machine
+import micropython
+from micropython import const
+from time import sleep_us
+
+# Pitot tube (Honeywell HSC/SSC) on I2C(0)
+PITOT_ADDR = const(0x28)
+
+def pitot_i2c(sda, scl):
+    # 400 kHz is the fastest clock the HSC/SSC I2C interface is specified for
+    return machine.I2C(0, sda=sda, scl=scl, freq=400000)
+
+# Direct pitot read on the RP2040 I2C0 block once machine.I2C has configured
+# it: queue four read commands (the last with STOP) and collect the bytes from
+# the RX FIFO, skipping the machine.I2C call path. Word offsets into the
+# DW_apb_i2c registers; raises OSError like readfrom_into on NACK/timeout.
+# This relies on the rp2 port's I2C setup (pico-sdk: master mode, 7-bit
+# addressing, controller left enabled after each transfer).
+I2C0_BASE = 0x40044000
+
+@micropython.viper
+def pitot_read(regs: ptr32, buf: ptr8):
+    # IC_TAR can only be written while disabled, so only retarget (and toggle
+    # IC_ENABLE) if another transfer left a different address or a disabled block
+    if (regs[1] & 0x3FF) != PITOT_ADDR or not (regs[27] & 1):
+        regs[27] = 0            # IC_ENABLE
+        regs[1] = PITOT_ADDR    # IC_TAR
+        regs[27] = 1
+    regs[4] = 0x100         # IC_DATA_CMD: read
+    regs[4] = 0x100
+    regs[4] = 0x100
+    regs[4] = 0x300         # read + STOP
+    n = 0
+    while regs[30] < 4:     # IC_RXFLR
+        if regs[13] & 0x40:  # IC_RAW_INTR_STAT.TX_ABRT (address NACK)
+            _ = regs[21]    # reading IC_CLR_TX_ABRT clears the abort
+            # The abort flushes the TX FIFO; empty the RX FIFO too so the next
+            # call does not pick up leftover bytes
+            while regs[30]:
+                _ = regs[4]
+            raise OSError(5)
+        n += 1
+        if n > 100000:
+            while regs[30]:
+                _ = regs[4]
+            raise OSError(110)
+    buf[0] = regs[4]
+    buf[1] = regs[4]
+    buf[2] = regs[4]
+    buf[3] = regs[4]
+
+# Status in the top two bits of the first byte: 0 = fresh reading, 1 = command
+# mode, 2 = stale (no new conversion since the last read), 3 = diagnostic fault
+PITOT_STALE = const(2)
+PITOT_FAULT = const(3)
+
+def pitot_read_status(buf):
+    # Pitot read into buf, retried briefly while the data is stale. Returns the
+    # status; only 0 is a usable reading, anything else is a failed sample
+    pitot_read(I2C0_BASE, buf)
+    for _ in range(5):
+        if buf[0] >> 6 != PITOT_STALE:
+            break
+        sleep_us(200)
+        pitot_read(I2C0_BASE, buf)
+    return buf[0] >> 6
+
+# Honeywell sensor: 1638 (min) to 14745 (max) counts = 0 to 1 psi, 1 psi = 6894.76 Pa
+PITOT_COUNTS_MIN = const(1638)
+PITOT_COUNTS_MAX = const(14745)
+# The RP2040 has no FPU, so pressure is carried in centi-Pa and airspeed in cm/s.
+# 1 count = 6894.76 / 13107 Pa = 52.604 cPa ~ 53866 / 1024
+PITOT_CPA_PER_COUNT_Q10 = const(53866)
+# v = sqrt(2 * dp / rho) with rho = 1.225 kg/m^3 (sea level, 15°C):
+# v[cm/s] = sqrt(dp[counts] * 8588)
+PITOT_CMS2_PER_COUNT = const(8588)
+
+@micropython.viper
+def parse_pitot_counts(data: ptr8) -> int:
+    # Pressure counts above the 0 psi output, clamped to the sensor range; the
+    # top two bits of the first byte are status, not pressure
+    raw = ((data[0] & 0x3F) << 8) | data[1]
+    if raw < PITOT_COUNTS_MIN:
+        raw = PITOT_COUNTS_MIN
+    elif raw > PITOT_COUNTS_MAX:
+        raw = PITOT_COUNTS_MAX
+    return raw - PITOT_COUNTS_MIN
+
+@micropython.viper
+def counts_to_cpa(counts: int) -> int:
+    return (counts * PITOT_CPA_PER_COUNT_Q10) >> 10
+
+@micropython.viper
+def airspeed_cms(counts: int) -> int:
+    # Bitwise integer sqrt of counts * 8588; 0 for non-positive pressure
+    if counts <= 0:
+        return 0
+    n = counts * PITOT_CMS2_PER_COUNT
+    res = 0
+    bit = 1 << 28  # largest power of 4 above 13107 * 8588
+    while bit > n:
+        bit >>= 2
+    while bit:
+        if n >= res + bit:
+            n -= res + bit
+            res = (res >> 1) + bit
+        else:
+            res >>= 1
+        bit >>= 2
+    return res
+
+def centi_str(v):
+    # "%.2f" of a value held in hundredths, without going through float
+    if v < 0:
+        return "-%d.%02d" % (-v // 100, -v % 100)
+    return "%d.%02d" % (v // 100, v % 100)
+
+# Constants for airspeed calculation
+SEA_LEVEL_PRESSURE_PA = 101325  # Pa
+SEA_LEVEL_TEMP_K = 288.15       # K
+ELEVATION_FT = 440
+ELEVATION_M = ELEVATION_FT * 0.3048
+
+def pressure_at_elevation(elevation_m):
+    L = 0.0065
+    R = 8.31447
+    M = 0.0289644
+    g = 9.80665
+    T0 = SEA_LEVEL_TEMP_K
+    P0 = SEA_LEVEL_PRESSURE_PA
+    return P0 * (1 - (L * elevation_m) / T0) ** (g * M / (R * L))
+
+STATIC_PRESSURE_PA = pressure_at_elevation(ELEVATION_M)
+
+# The onboard temperature sensor (RP2040) is connected to ADC4
+temp_sensor = machine.ADC(4)
+# Convert 16-bit reading (0-65535) to voltage (3.3V reference)
+TEMP_V_PER_COUNT = 3.3 / 65535
+# According to RP2040 datasheet:
+# Temperature (in °C) = 27 - (V_sensor - 0.706)/0.001721
+TEMP_C_PER_V = 1 / 0.001721
+
+# Function to read onboard temperature sensor (RP2040)
+def read_onboard_temp_c():
+    return 27 - (temp_sensor.read_u16() * TEMP_V_PER_COUNT - 0.706) * TEMP_C_PER_V
@@ -1,20 +1,21 @@
 #!/usr/bin/env python
 
-from flask import Flask, request, jsonify, send_file, make_response
+from flask import Flask, request, jsonify, Response, stream_with_context
 import os
 from main import generate_and_upload_wind_plot
-import tempfile
-from werkzeug.utils import secure_filename
-from websockets.sync.client import connect
-import json
-import threading
+from publish import publish_bp
+import time
 from flask_cors import CORS
 import logging
-import gc
 from werkzeug.middleware.proxy_fix import ProxyFix
 import uuid
-import boto3
-from datetime import datetime
+import tempfile
+import threading
+import multiprocessing
+import orjson
+from flask.json.provider import JSONProvider
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 # Configure logging
 logging.basicConfig(
@@ -27,67 +28,148 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# S3 Configuration
-S3_BUCKET = os.environ.get('S3_BUCKET', 'airfq')
-S3_REGION = os.environ.get('AWS_REGION', 'us-west-2')
-S3_URL_EXPIRATION = 604800  # 7 days in seconds
-
-# Initialize S3 client
-s3 = boto3.client(
-    's3',
-    aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-    aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-    region_name=S3_REGION
-)
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
-CORS(app)  # Enable CORS for all routes
+# CORS only where a browser calls in (the dashboard hits the wind-data routes);
+# /publish is only used by the flight unit
+CORS(app, resources={r"/": {"origins": "*"}, r"/wind-data.*": {"origins": "*"}},
+     send_wildcard=True, automatic_options=True)
+app.register_blueprint(publish_bp)
+
+# Plot jobs run in worker processes, so a matplotlib render and S3 upload do
+# not hold a request thread (pyplot is not thread-safe either). Every gunicorn
+# worker has its own pool, so the host runs workers x PLOT_WORKERS renders.
+PLOT_WORKERS = int(os.environ.get('PLOT_WORKERS', '2'))
+plot_executor = None
+plot_executor_lock = threading.Lock()
+
+def init_plot_worker():
+    # Workers start fresh from the forkserver: pay for the matplotlib/Basemap
+    # imports and the S3 client (and its connection pool) once per worker,
+    # not per plot
+    import main
+    main.get_s3_client()
 
-def upload_file_to_s3(file_path, bucket, object_name=None):
-    """Upload a file to S3 bucket and return the URL"""
-    if object_name is None:
-        # Use timestamp and UUID for unique filename
-        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
-        random_id = str(uuid.uuid4())[:8]
-        object_name = f"wind-plots/{timestamp}-{random_id}-{os.path.basename(file_path)}"
+def get_plot_executor():
+    global plot_executor
+    with plot_executor_lock:
+        if plot_executor is None:
+            # Workers come from a forkserver rather than being forked from this
+            # process, which already runs request and publish threads
+            plot_executor = ProcessPoolExecutor(
+                max_workers=PLOT_WORKERS, initializer=init_plot_worker,
+                mp_context=multiprocessing.get_context('forkserver')
+            )
+        return plot_executor
 
+def reset_plot_executor(broken):
+    # A worker that dies (e.g. OOM-killed mid-render) breaks the whole pool;
+    # drop it so the next call builds a new one
+    global plot_executor
+    with plot_executor_lock:
+        if plot_executor is broken:
+            plot_executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def submit_plot(fn, *args, **kwargs):
+    executor = get_plot_executor()
     try:
-        # Set content type for viewable images
-        content_type = 'image/png'
-        
-        # Upload file to S3 with content type and content disposition headers
-        s3.upload_file(
-            file_path, 
-            bucket, 
-            object_name,
-            ExtraArgs={
-                'ContentType': content_type,
-                'ContentDisposition': 'inline'  # This makes it viewable in browser
-            }
-        )
-        
-        # Generate URL
-        url = f"https://{bucket}.s3.{S3_REGION}.amazonaws.com/{object_name}"
-        return url
+        return executor.submit(fn, *args, **kwargs)
+    except BrokenProcessPool:
+        reset_plot_executor(executor)
+        return get_plot_executor().submit(fn, *args, **kwargs)
+
+def run_plot(fn, *args, **kwargs):
+    # Synchronous routes retry once on a fresh pool if the worker died
+    executor = get_plot_executor()
+    try:
+        return executor.submit(fn, *args, **kwargs).result()
+    except BrokenProcessPool:
+        reset_plot_executor(executor)
+        return get_plot_executor().submit(fn, *args, **kwargs).result()
+
+# Job state lives in one small JSON file per job rather than in process
+# memory, so a progress request can land on any worker on the host. Files not
+# touched for JOB_TTL seconds (jobs nobody polled) are swept on each submit.
+JOB_DIR = os.path.join(tempfile.gettempdir(), 'airfq-jobs')
+JOB_TTL = 3600
+# A progress stream gives up on a job whose state has not changed for this
+# long, so a stuck job does not hold a request thread until JOB_TTL
+JOB_STALL_TIMEOUT = 300
+
+def job_file(job_id):
+    return os.path.join(JOB_DIR, f"{job_id}.json")
+
+def write_job(job_id, state, **fields):
+    path = job_file(job_id)
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(orjson.dumps({'state': state, **fields}))
+    os.replace(tmp_file, path)
+
+def read_job(job_id):
+    # None for unknown jobs, and for jobs stuck past JOB_TTL (e.g. a crashed
+    # pool) so a progress stream does not wait on them forever
+    try:
+        with open(job_file(job_id), 'rb') as f:
+            updated = os.fstat(f.fileno()).st_mtime
+            if time.time() - updated > JOB_TTL:
+                return None
+            job = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    job['updated'] = updated
+    return job
+
+def expire_jobs():
+    cutoff = time.time() - JOB_TTL
+    for name in os.listdir(JOB_DIR):
+        path = os.path.join(JOB_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+def run_plot_job(job_id, departure, arrival, level, **kwargs):
+    # Runs in the plot pool and records each state change for the progress route
+    write_job(job_id, 'running')
+    try:
+        url = generate_and_upload_wind_plot(departure, arrival, level, **kwargs)
     except Exception as e:
-        logger.error(f"Error uploading to S3: {str(e)}")
-        raise
+        write_job(job_id, 'error', error=str(e))
+    else:
+        write_job(job_id, 'done', url=url)
+
+def record_lost_job(job_id, future):
+    # run_plot_job records its own result, so a cancelled or failed future
+    # means the pool broke before it could
+    if future.cancelled() or future.exception() is not None:
+        write_job(job_id, 'error', error='Plot worker died')
 
 @app.route('/wind-data', methods=['POST'])
 def get_wind_data():
     try:
-        if request.is_json:
-            data = request.get_json()
-        else:
-            data = request.form.to_dict()
+        data = request.get_json(silent=True, cache=False) or request.form.to_dict()
         if not data or 'departure' not in data or 'arrival' not in data or 'level' not in data:
             return jsonify({'error': 'Missing required parameters (departure, arrival, level)'}), 400
         departure = data['departure']
         arrival = data['arrival']
         level = data['level']
         # Always generate low-res
-        s3_url = generate_and_upload_wind_plot(departure, arrival, level, low_res=True, augmented=False)
+        s3_url = run_plot(
+            generate_and_upload_wind_plot, departure, arrival, level, low_res=True, augmented=False
+        )
         return jsonify({
             'status': 'success',
             'url': s3_url,
@@ -102,10 +184,7 @@ def get_wind_data():
 @app.route('/wind-data-augmented', methods=['POST'])
 def get_wind_data_augmented():
     try:
-        if request.is_json:
-            data = request.get_json()
-        else:
-            data = request.form.to_dict()
+        data = request.get_json(silent=True, cache=False) or request.form.to_dict()
         required_params = ['departure', 'arrival', 'level']
         if not data or not all(param in data for param in required_params):
             return jsonify({'error': f'Missing required parameters: {", ".join(required_params)}'}), 400
@@ -115,7 +194,8 @@ def get_wind_data_augmented():
         magnitude_factor = float(data.get('magnitude_factor', 1.5))
         angle_factor = float(data.get('angle_factor', 0.5))
         # Always generate low-res
-        s3_url = generate_and_upload_wind_plot(
+        s3_url = run_plot(
+            generate_and_upload_wind_plot,
             departure, arrival, level,
             magnitude_factor=magnitude_factor,
             angle_factor=angle_factor,
@@ -135,93 +215,117 @@ def get_wind_data_augmented():
         logger.exception(f"Error in wind-data-augmented endpoint: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.after_request
-def after_request(response):
-    # Ensure CORS headers are set for all responses
-    response.headers['Access-Control-Allow-Origin'] = '*'
-    response.headers['Access-Control-Allow-Headers'] = 'Content-Type,Authorization'
-    response.headers['Access-Control-Allow-Methods'] = 'GET,POST,OPTIONS'
-    return response
-
-@app.route('/', methods=['GET'])
-def index():
+@app.route('/wind-data-jobs', methods=['POST'])
+def submit_wind_data_job():
     try:
-        response = jsonify({
-            'message': 'Wind Data API',
-            'status': 'OK',
-            'endpoints': {
-                'wind-data': {
-                    'method': 'POST',
-                    'parameters': {
-                        'departure': 'ICAO airport code (e.g., KSMO)',
-                        'arrival': 'ICAO airport code (e.g., KJFK)',
-                        'level': 'Flight level (e.g., "030" or 30)',
-                        'max_pixels': 'Maximum image dimension in pixels (default: 2000)'
-                    },
-                    'returns': 'JSON with S3 URL to the generated PNG'
-                },
-                'wind-data-augmented': {
-                    'method': 'POST',
-                    'parameters': {
-                        'departure': 'ICAO airport code (e.g., KSMO)',
-                        'arrival': 'ICAO airport code (e.g., KJFK)',
-                        'level': 'Flight level (e.g., "030" or 30)',
-                        'magnitude_factor': 'Factor to multiply wind speeds (default: 1.5)',
-                        'angle_factor': 'Factor to add to wind direction proportional to speed (default: 0.5)',
-                        'max_pixels': 'Maximum image dimension in pixels (default: 2000)'
-                    },
-                    'returns': 'JSON with S3 URL to the generated PNG'
-                }
-            }
-        })
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        return response
+        data = request.get_json(silent=True, cache=False) or request.form.to_dict()
+        required_params = ['departure', 'arrival', 'level']
+        if not data or not all(param in data for param in required_params):
+            return jsonify({'error': f'Missing required parameters: {", ".join(required_params)}'}), 400
+        augmented = str(data.get('augmented', '')).lower() in ('1', 'true', 'yes')
+        kwargs = {'low_res': True, 'augmented': augmented}
+        if augmented:
+            kwargs['magnitude_factor'] = float(data.get('magnitude_factor', 1.5))
+            kwargs['angle_factor'] = float(data.get('angle_factor', 0.5))
+        job_id = str(uuid.uuid4())
+        os.makedirs(JOB_DIR, exist_ok=True)
+        expire_jobs()
+        write_job(job_id, 'queued')
+        future = submit_plot(
+            run_plot_job, job_id, data['departure'], data['arrival'], data['level'], **kwargs
+        )
+        future.add_done_callback(lambda f: record_lost_job(job_id, f))
+        return jsonify({
+            'status': 'queued',
+            'job_id': job_id,
+            'progress': f'/wind-data-jobs/{job_id}/progress'
+        }), 202
     except Exception as e:
-        logger.exception(f"Error in index route: {str(e)}")
+        logger.exception(f"Error in wind-data-jobs endpoint: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-# Hardcoded WebSocket channel
-HARDCODED_CHANNEL = "wss://s14544.blr1.piesocket.com/v3/kushagarwal?api_key=iJshgbsdZocGM142oxMQ3XxtKzAcfs9sru2aBVuH"
+@app.route('/wind-data-jobs/<uuid:job_id>/progress', methods=['GET'])
+def wind_data_job_progress(job_id):
+    """Server-sent events: queued -> running -> done (with the S3 URL) or error"""
+    job_id = str(job_id)
+    if read_job(job_id) is None:
+        return jsonify({'error': 'Unknown job'}), 404
 
-def publish_to_channel(message):
-    # Send the message to the hardcoded websocket channel using websockets.sync.client.connect
-    try:
-        # Convert message to JSON string if it's not already a string
-        if not isinstance(message, str):
-            message = json.dumps(message)
-        with connect(HARDCODED_CHANNEL) as websocket:
-            websocket.send(message)
-            # Optionally, receive a response (not required, but for demonstration)
-            try:
-                response = websocket.recv()
-                print(f"Received from WS: {response}")
-            except Exception:
-                pass
-    except Exception as e:
-        print(f"Error sending message to websocket: {e}")
-
-@app.route('/publish', methods=['POST'])
-def publish():
-    """
-    Accepts JSON with 'data', and initiates publishing 'data' to the hardcoded websocket channel.
-    Example input:
-    {
-        "data": { ... }
-    }
-    """
-    try:
-        payload = request.get_json(force=True)
-        data = payload.get('data')
-        if data is None:
-            return jsonify({'error': 'Missing data'}), 400
+    def events():
+        state = None
+        while True:
+            job = read_job(job_id)
+            if job is None:
+                yield f"event: error\ndata: {orjson.dumps({'error': 'Job expired'}).decode()}\n\n"
+                return
+            if job['state'] in ('done', 'error'):
+                break
+            if time.time() - job['updated'] > JOB_STALL_TIMEOUT:
+                yield f"event: error\ndata: {orjson.dumps({'error': 'Job stalled'}).decode()}\n\n"
+                return
+            if job['state'] != state:
+                state = job['state']
+                yield f"event: {state}\ndata: {{}}\n\n"
+            time.sleep(0.5)
+        # The result is handed out once; the job is forgotten afterwards
+        try:
+            os.remove(job_file(job_id))
+        except OSError:
+            pass
+        if job['state'] == 'done':
+            payload = {'status': 'success', 'url': job['url']}
+            yield f"event: done\ndata: {orjson.dumps(payload).decode()}\n\n"
+        else:
+            yield f"event: error\ndata: {orjson.dumps({'error': job['error']}).decode()}\n\n"
 
-        # Initiate publishing the data to the hardcoded channel without waiting for completion
-        threading.Thread(target=publish_to_channel, args=(data,)).start()
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
 
-        return jsonify({'status': 'publishing initiated', 'channel': HARDCODED_CHANNEL}), 200
-    except Exception as e:
-        logger.error(f"Error in /publish: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+# The index document never changes, so it is serialized once at import
+INDEX_BODY = orjson.dumps({
+    'message': 'Wind Data API',
+    'status': 'OK',
+    'endpoints': {
+        'wind-data': {
+            'method': 'POST',
+            'parameters': {
+                'departure': 'ICAO airport code (e.g., KSMO)',
+                'arrival': 'ICAO airport code (e.g., KJFK)',
+                'level': 'Flight level (e.g., "030" or 30)',
+                'max_pixels': 'Maximum image dimension in pixels (default: 2000)'
+            },
+            'returns': 'JSON with S3 URL to the generated PNG'
+        },
+        'wind-data-augmented': {
+            'method': 'POST',
+            'parameters': {
+                'departure': 'ICAO airport code (e.g., KSMO)',
+                'arrival': 'ICAO airport code (e.g., KJFK)',
+                'level': 'Flight level (e.g., "030" or 30)',
+                'magnitude_factor': 'Factor to multiply wind speeds (default: 1.5)',
+                'angle_factor': 'Factor to add to wind direction proportional to speed (default: 0.5)',
+                'max_pixels': 'Maximum image dimension in pixels (default: 2000)'
+            },
+            'returns': 'JSON with S3 URL to the generated PNG'
+        },
+        'wind-data-jobs': {
+            'method': 'POST',
+            'parameters': {
+                'departure': 'ICAO airport code (e.g., KSMO)',
+                'arrival': 'ICAO airport code (e.g., KJFK)',
+                'level': 'Flight level (e.g., "030" or 30)',
+                'augmented': 'Generate the augmented plot (default: false)',
+                'magnitude_factor': 'As for wind-data-augmented',
+                'angle_factor': 'As for wind-data-augmented'
+            },
+            'returns': 'JSON with a job id; GET /wind-data-jobs/<job_id>/progress streams progress events ending with the S3 URL'
+        }
+    }
+})
+
+@app.route('/', methods=['GET'])
+def index():
+    return Response(INDEX_BODY, mimetype='application/json')
 
 def create_app():
     """Factory function for creating the app instance"""
@@ -1,113 +1,260 @@
+import io
+import bisect
 import os
-import uuid
+import hashlib
+import time
+import pickle
+import threading
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from functools import lru_cache
+from math import floor, ceil
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import tempfile
 import logging
 
-# Set MPLCONFIGDIR to a writable temp directory before importing matplotlib
-import tempfile
+# Set MPLCONFIGDIR to a writable temp directory before importing matplotlib.
+# A fixed path rather than a fresh mkdtemp, so every process and restart
+# reuses the font cache instead of rebuilding it on import.
 mplconfigdir = os.environ.get("MPLCONFIGDIR")
 if not mplconfigdir:
-    temp_mpl_dir = tempfile.mkdtemp(prefix="mplconfigdir_")
+    temp_mpl_dir = os.path.join(tempfile.gettempdir(), "airfq-mplconfig")
+    os.makedirs(temp_mpl_dir, exist_ok=True)
     os.environ["MPLCONFIGDIR"] = temp_mpl_dir
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import matplotlib
 matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import numpy as np
+import rasterio
 from mpl_toolkits.basemap import Basemap
 from datetime import datetime, timezone, timedelta
-from math import radians, sin, cos, sqrt, atan2
 
 padding = 0.1
 
+# One pooled session for the airport, wind and terrain APIs, so repeated calls
+# to the same host reuse keep-alive connections
+http_session = requests.Session()
+http_session.headers.update({
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+})
+http_adapter = HTTPAdapter(
+    pool_connections=8, pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+)
+http_session.mount('http://', http_adapter)
+http_session.mount('https://', http_adapter)
+
 def haversine(lat1, lon1, lat2, lon2):
+    # Great-circle distance in km; takes scalars or NumPy arrays
     R = 6371.0
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat / 2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    return R * c
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlon = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(dlat * 0.5)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon * 0.5)**2
+    return R * 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+# Route distances (km) at which the wind grid drops to the next coarser zoom
+ZOOM_THRESHOLDS_KM = (100, 250, 500, 1000, 2000)
+ZOOM_LEVELS = ("12", "11", "10", "9", "8", "7")
 
 def get_zoom_for_distance(distance_km):
-    if distance_km < 100:
-        return "12"
-    elif distance_km < 250:
-        return "11"
-    elif distance_km < 500:
-        return "10"
-    elif distance_km < 1000:
-        return "9"
-    elif distance_km < 2000:
-        return "8"
-    else:
-        return "7"
+    return ZOOM_LEVELS[bisect.bisect_right(ZOOM_THRESHOLDS_KM, distance_km)]
 
-def get_airport_by_icao(icao_code):
+AIRPORT_CACHE_TTL = 30 * 24 * 3600  # airport coordinates practically never change
+
+@lru_cache(maxsize=1024)
+def cached_airport(icao_code):
+    """
+    API-Ninjas airport lookup memoized in memory and as JSON on disk for
+    AIRPORT_CACHE_TTL. Unknown codes and failed lookups are not cached.
+    """
+    cache_file = os.path.join(TERRAIN_CACHE_DIR, f"airport_{icao_code}.json")
+    try:
+        if time.time() - os.path.getmtime(cache_file) < AIRPORT_CACHE_TTL:
+            with open(cache_file, 'rb') as f:
+                return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        pass
     api_url = f'https://api.api-ninjas.com/v1/airports?icao={icao_code}'
-    response = requests.get(api_url, headers={'X-Api-Key': os.getenv('AIRPORT_KEY')})
-    if response.status_code == requests.codes.ok:
-        data = response.json()
-        if data:
-            return data[0]
-    return None
+    response = http_session.get(api_url, headers={'X-Api-Key': os.getenv('AIRPORT_KEY')})
+    if response.status_code != requests.codes.ok:
+        raise LookupError(icao_code)
+    data = orjson.loads(response.content)
+    if not data:
+        raise LookupError(icao_code)
+    try:
+        os.makedirs(TERRAIN_CACHE_DIR, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(data[0]))
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+    return data[0]
+
+def get_airport_by_icao(icao_code):
+    try:
+        return cached_airport(icao_code.upper())
+    except LookupError:
+        return None
 
 def make_request_with_params(base_url, params):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    response = requests.get(base_url, params=params, headers=headers)
-    return response.json()
+    response = http_session.get(base_url, params=params)
+    # The wind-model GeoJSON is the largest payload per level; orjson parses it
+    # several times faster than the stdlib json behind response.json()
+    return orjson.loads(response.content)
 
-def fetch_terrain_data(min_lon, max_lon, min_lat, max_lat, resolution=0.05):
+DEM_NODATA = -32768
+
+def fetch_terrain_data(min_lon, max_lon, min_lat, max_lat, demtype="SRTMGL1"):
     url = "https://portal.opentopography.org/API/globaldem"
     params = {
-        "demtype": "SRTMGL1",
+        "demtype": demtype,
         "south": min_lat,
         "north": max_lat,
         "west": min_lon,
         "east": max_lon,
-        "outputFormat": "AAIGrid"
+        "outputFormat": "GTiff"
     }
-    response = requests.get(url, params=params)
-    if response.status_code != 200:
+    # Binary int16 GeoTIFF: about a quarter of the AAIGrid text and decoded by
+    # GDAL. The body is streamed straight into GDAL's in-memory file rather than
+    # buffered by requests first and then copied.
+    with http_session.get(url, params=params, stream=True, timeout=60) as response:
+        if response.status_code != 200:
+            return None, None, None
+        with rasterio.MemoryFile() as mem:
+            for chunk in response.iter_content(chunk_size=1 << 16):
+                mem.write(chunk)
+            with mem.open() as ds:
+                elevation = ds.read(1)
+                transform = ds.transform
+                nodata = ds.nodata
+    # Metres fit int16; nodata cells carry the DEM_NODATA sentinel instead of NaN
+    if nodata is not None and nodata != DEM_NODATA:
+        elevation[elevation == nodata] = DEM_NODATA
+    elevation = elevation.astype(np.int16, copy=False)
+
+    # Pixel centres; rows run north to south, matching the elevation rows
+    nrows, ncols = elevation.shape
+    lons = (transform.c + (np.arange(ncols) + 0.5) * transform.a).astype(np.float32)
+    lats = (transform.f + (np.arange(nrows) + 0.5) * transform.e).astype(np.float32)
+    # 1-D axes rather than meshgrids
+    return lons, lats, elevation
+
+TERRAIN_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'airfq')
+
+@lru_cache(maxsize=64)
+def cached_terrain_data(min_lon, max_lon, min_lat, max_lat, demtype):
+    """
+    fetch_terrain_data memoized per bounding box, in memory and as an .npz on
+    disk so other worker processes reuse the download. Failures are not cached.
+    """
+    key = hashlib.sha1(f"{min_lon},{max_lon},{min_lat},{max_lat},{demtype}".encode()).hexdigest()
+    cache_file = os.path.join(TERRAIN_CACHE_DIR, f"dem_axes_{key}.npz")
+    try:
+        with np.load(cache_file) as cached:
+            return cached['lons'], cached['lats'], cached['elevation']
+    except Exception:
+        pass
+    lons, lats, elevation = fetch_terrain_data(min_lon, max_lon, min_lat, max_lat, demtype)
+    if elevation is None:
+        raise RuntimeError('Terrain data unavailable')
+    try:
+        os.makedirs(TERRAIN_CACHE_DIR, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            np.savez_compressed(f, lons=lons, lats=lats, elevation=elevation)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+    return lons, lats, elevation
+
+def fetch_terrain_grid(min_lon, max_lon, min_lat, max_lat, demtype="SRTMGL1"):
+    # Terrain is optional shading; plots go ahead without it on any failure,
+    # and demtype None skips it outright
+    if demtype is None:
+        return None, None, None
+    # Snapped outward to a 0.1° grid so nearby routes share cached tiles; the
+    # part outside the map is clipped by the axes
+    try:
+        return cached_terrain_data(
+            floor(min_lon * 10) / 10, ceil(max_lon * 10) / 10,
+            floor(min_lat * 10) / 10, ceil(max_lat * 10) / 10, demtype
+        )
+    except Exception:
         return None, None, None
 
-    content = response.text
-    header_lines = []
-    data_lines = []
-    for line in content.splitlines():
-        if line.strip() == "":
-            continue
-        if len(header_lines) < 6:
-            header_lines.append(line)
-        else:
-            data_lines.append(line)
-    header = {}
-    for line in header_lines:
-        k, v = line.strip().split()
-        header[k.lower()] = float(v)
-    ncols = int(header['ncols'])
-    nrows = int(header['nrows'])
-    xllcorner = header['xllcorner']
-    yllcorner = header['yllcorner']
-    cellsize = header['cellsize']
-    nodata = header['nodata_value']
-
-    data = []
-    for line in data_lines:
-        data.extend([float(x) for x in line.strip().split()])
-    elevation = np.array(data).reshape((nrows, ncols))
-    elevation[elevation == nodata] = np.nan
-
-    lons = xllcorner + np.arange(ncols) * cellsize
-    lats = yllcorner + np.arange(nrows) * cellsize
-    lats = lats[::-1]
-    elevation = np.flipud(elevation)
-    lon_grid, lat_grid = np.meshgrid(lons, lats)
-    return lon_grid, lat_grid, elevation
+def fetch_levels_and_terrain(base_url, params_for_level, levels, plot_bbox, detail):
+    """
+    Fetch the winds for every level and the terrain grid concurrently.
+    The terrain only depends on the bounding box, so it is fetched once and
+    shared by all levels. The Basemap is built meanwhile, so the per-level
+    plots that follow all find it cached.
+    """
+    min_lon, max_lon, min_lat, max_lat = plot_bbox
+    map_resolution, demtype, _ = detail
+    with ThreadPoolExecutor(max_workers=len(levels) + 2) as pool:
+        basemap = pool.submit(get_basemap, min_lon, max_lon, min_lat, max_lat, map_resolution)
+        terrain = pool.submit(fetch_terrain_grid, min_lon, max_lon, min_lat, max_lat, demtype)
+        level_data = list(pool.map(lambda level: make_request_with_params(base_url, params_for_level(level)), levels))
+        basemap.result()
+        return level_data, terrain.result()
+
+@lru_cache(maxsize=16)
+def cached_basemap(min_lon, max_lon, min_lat, max_lat, resolution):
+    """
+    Mercator Basemap for a bounding box, memoized in memory and pickled to
+    disk. Building one at 'i' or finer resolution re-parses the GSHHS
+    coastlines, which costs seconds per plot. The map is not bound to any axes;
+    callers pass it with ax=.
+    """
+    key = hashlib.sha1(f"{min_lon},{max_lon},{min_lat},{max_lat},{resolution}".encode()).hexdigest()
+    cache_file = os.path.join(TERRAIN_CACHE_DIR, f"basemap_{key}.pkl")
+    try:
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        pass
+    m = Basemap(projection='merc', llcrnrlat=min_lat, urcrnrlat=max_lat,
+                llcrnrlon=min_lon, urcrnrlon=max_lon, resolution=resolution)
+    try:
+        os.makedirs(TERRAIN_CACHE_DIR, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(m, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+    return m
+
+def get_basemap(min_lon, max_lon, min_lat, max_lat, resolution='i'):
+    # The map is shared between threads, so draw calls pass ax= explicitly
+    return cached_basemap(round(min_lon, 4), round(max_lon, 4), round(min_lat, 4), round(max_lat, 4), resolution)
+
+def map_detail(route_distance_km):
+    """
+    Returns (Basemap resolution, DEM type or None, draw states) for a route.
+    Short hops skip the terrain download, and long routes use coarse
+    coastlines and the 90 m DEM instead of the 30 m one. 'i' is the finest
+    coastline level basemap-data ships ('h'/'f' need basemap-data-hires).
+    """
+    if route_distance_km < 50:
+        return 'i', None, False
+    if route_distance_km < 200:
+        return 'i', None, True
+    if route_distance_km > 1000:
+        return 'l', 'SRTMGL3', True
+    return 'i', 'SRTMGL1', True
 
 # --- Helper for consistent plot sizing and aspect ratio ---
 def get_plot_dimensions(min_lon, max_lon, min_lat, max_lat, base_dpi=300, base_width=15, max_pixels=2000):
@@ -147,35 +294,87 @@ def get_plot_dimensions(min_lon, max_lon, min_lat, max_lat, base_dpi=300, base_w
     
     return (width, height), base_dpi
 
-def plot_wind_data(
-    data, airport_coords, airport_names, level, output_dir,
-    plot_bbox=None, plot_figsize=None, plot_dpi=None, max_pixels=2000
-):
-    features = data['features']
+def wind_arrays(features):
+    """
+    Returns (lons, lats, wdir, wspd) arrays for the features that carry a
+    position and numeric wind direction/speed, so components can be computed
+    in one vectorized pass.
+    """
     lons = []
     lats = []
-    u_components = []
-    v_components = []
-
+    wdirs = []
+    wspds = []
     for feature in features:
         if 'geometry' in feature and 'coordinates' in feature['geometry']:
             lon, lat = feature['geometry']['coordinates']
             if 'properties' in feature and 'wdir' in feature['properties'] and 'wspd' in feature['properties']:
-                wdir = feature['properties']['wdir']
-                wspd = feature['properties']['wspd']
                 try:
-                    wdir = float(wdir)
-                    wspd = float(wspd)
+                    wdir = float(feature['properties']['wdir'])
+                    wspd = float(feature['properties']['wspd'])
                 except ValueError:
                     continue
                 lons.append(lon)
                 lats.append(lat)
-                rad = np.deg2rad(wdir)
-                u = wspd * np.sin(rad)
-                v = wspd * np.cos(rad)
-                u_components.append(u)
-                v_components.append(v)
+                wdirs.append(wdir)
+                wspds.append(wspd)
+    return (np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64),
+            np.asarray(wdirs, dtype=np.float32), np.asarray(wspds, dtype=np.float32))
+
+# Each thread keeps one Agg figure and canvas and clears it between plots.
+# Standalone figures rather than pyplot's global state, so levels can render
+# on separate threads.
+plot_figures = threading.local()
+
+def plot_figure(figsize, dpi):
+    fig = getattr(plot_figures, 'fig', None)
+    if fig is None:
+        fig = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(fig)
+        plot_figures.fig = fig
+    else:
+        fig.clf()
+        fig.set_size_inches(figsize)
+        fig.set_dpi(dpi)
+    return fig
+
+def map_levels(plot_level, levels, level_data):
+    # A single level renders on the calling thread, reusing its figure
+    if len(levels) == 1:
+        return [plot_level(levels[0], level_data[0])]
+    with ThreadPoolExecutor(max_workers=min(8, len(levels))) as pool:
+        return list(pool.map(plot_level, levels, level_data))
+
+QUIVER_SPACING_IN = 0.4
 
+def bin_wind_layers(x, y, quiver_layers, extent, nx, ny):
+    """
+    Averages each layer's u/v onto an nx by ny grid over extent (map
+    coordinates) and returns the centres of the non-empty cells with the
+    binned layers. Points outside the extent are dropped.
+    """
+    x0, x1, y0, y1 = extent
+    bins = (np.linspace(x0, x1, nx + 1), np.linspace(y0, y1, ny + 1))
+    count, x_edges, y_edges = np.histogram2d(x, y, bins=bins)
+    filled = count > 0
+    x_mid = (x_edges[:-1] + x_edges[1:]) * 0.5
+    y_mid = (y_edges[:-1] + y_edges[1:]) * 0.5
+    x_centres, y_centres = np.meshgrid(x_mid, y_mid, indexing='ij')
+    count = count[filled]
+    binned_layers = []
+    for u, v, color, alpha in quiver_layers:
+        u_mean = np.histogram2d(x, y, bins=bins, weights=u)[0][filled] / count
+        v_mean = np.histogram2d(x, y, bins=bins, weights=v)[0][filled] / count
+        binned_layers.append((u_mean, v_mean, color, alpha))
+    return x_centres[filled], y_centres[filled], binned_layers
+
+def plot_wind_layers(
+    lons, lats, quiver_layers, airport_coords, output_file,
+    plot_bbox=None, plot_figsize=None, plot_dpi=None, max_pixels=2000, terrain=None, detail=None
+):
+    """
+    Draws the map, terrain and route once and one quiver per (u, v, color, alpha)
+    entry of quiver_layers at the given points, then saves the PNG to output_file.
+    """
     from_lon, from_lat = airport_coords[0]
     to_lon, to_lat = airport_coords[1]
     if plot_bbox is not None:
@@ -186,184 +385,149 @@ def plot_wind_data(
         min_lat = min(from_lat, to_lat) - padding
         max_lat = max(from_lat, to_lat) + padding
 
-    # Get consistent figure size and dpi
+    # Get consistent figure size and dpi; the PNG is saved at this dpi so
+    # max_pixels bounds the output size
     if plot_figsize is None or plot_dpi is None:
         plot_figsize, plot_dpi = get_plot_dimensions(min_lon, max_lon, min_lat, max_lat, max_pixels=max_pixels)
 
-    try:
-        lon_grid, lat_grid, elevation = fetch_terrain_data(min_lon, max_lon, min_lat, max_lat)
-    except Exception:
-        lon_grid, lat_grid, elevation = None, None, None
+    if detail is None:
+        detail = map_detail(haversine(from_lat, from_lon, to_lat, to_lon))
+    map_resolution, demtype, draw_states = detail
+
+    if terrain is None:
+        terrain = fetch_terrain_grid(min_lon, max_lon, min_lat, max_lat, demtype)
+    terrain_lons, terrain_lats, elevation = terrain
 
-    plt.rcParams['svg.fonttype'] = 'none'
-    fig = plt.figure(figsize=plot_figsize, dpi=plot_dpi)
+    fig = plot_figure(plot_figsize, plot_dpi)
     ax = fig.add_axes([0, 0, 1, 1])  # full-figure axes, no border
 
     # Set white background
     fig.patch.set_facecolor('white')
     ax.set_facecolor('white')
 
-    m = Basemap(projection='merc', llcrnrlat=min_lat, urcrnrlat=max_lat,
-                llcrnrlon=min_lon, urcrnrlon=max_lon, resolution='i', ax=ax)
-
-    if lon_grid is not None and lat_grid is not None and elevation is not None:
-        elev_masked = np.ma.masked_invalid(elevation)
-        x_terr, y_terr = m(lon_grid, lat_grid)
-        vmin = np.nanmin(elev_masked)
-        vmax = np.nanmax(elev_masked)
+    m = get_basemap(min_lon, max_lon, min_lat, max_lat, map_resolution)
+
+    if terrain_lons is not None and terrain_lats is not None and elevation is not None:
+        # Never draw more DEM cells than there are output pixels
+        width_px, height_px = fig.get_size_inches() * plot_dpi
+        stride = max(1, int(np.ceil(max(elevation.shape[0] / height_px, elevation.shape[1] / width_px))))
+        # South-to-north for transform_scalar, which wants increasing axes
+        terrain_lons = terrain_lons[::stride]
+        terrain_lats = terrain_lats[::stride][::-1]
+        elev = elevation[::stride, ::stride][::-1]
+        # The DEM is regular in latitude but Mercator stretches y, so resample
+        # it (nearest, keeping the nodata sentinel exact) onto a grid regular in
+        # map coordinates and blit it as one image instead of a quad mesh. The
+        # output grid spans the map corners, not the (larger, snapped) DEM, and
+        # any map cell outside the DEM gets the nodata sentinel
+        elev = m.transform_scalar(elev, terrain_lons, terrain_lats, len(terrain_lons), len(terrain_lats),
+                                  order=0, masked=DEM_NODATA)
+        # Integer sentinel compare; the resampled grid is ours, so mask it in place
+        elev_masked = np.ma.masked_equal(elev, DEM_NODATA, copy=False)
+        has_terrain = elev_masked.count() > 0
+        vmin = elev_masked.min() if has_terrain else 0
+        vmax = elev_masked.max() if has_terrain else 0
         vmin = max(0, vmin)
         vmax = max(vmax, vmin + 1)
-        m.pcolormesh(x_terr, y_terr, elev_masked, cmap='terrain', shading='auto', alpha=0.6, vmin=vmin, vmax=vmax)
-
-    m.drawcoastlines(linewidth=0.5)
-    m.drawcountries(linewidth=0.5)
-    m.drawstates(linewidth=0.3)
-    m.drawparallels(np.arange(int(min_lat), int(max_lat) + 1, 2), labels=[0, 0, 0, 0])
-    m.drawmeridians(np.arange(int(min_lon), int(max_lon) + 1, 2), labels=[0, 0, 0, 0])
-
+        # Placed on the map corners, which is the grid transform_scalar returned
+        ax.imshow(elev_masked, extent=(m.llcrnrx, m.urcrnrx, m.llcrnry, m.urcrnry), origin='lower', interpolation='nearest',
+                  cmap='terrain', alpha=0.6, vmin=vmin, vmax=vmax)
+
+    m.drawcoastlines(linewidth=0.5, ax=ax)
+    m.drawcountries(linewidth=0.5, ax=ax)
+    if draw_states:
+        m.drawstates(linewidth=0.3, ax=ax)
+    # Only graticule lines that fall inside the map; small maps often have none
+    parallels = np.arange(int(min_lat), int(max_lat) + 1, 2)
+    parallels = parallels[(parallels >= min_lat) & (parallels <= max_lat)]
+    if parallels.size:
+        m.drawparallels(parallels, labels=[0, 0, 0, 0], ax=ax)
+    meridians = np.arange(int(min_lon), int(max_lon) + 1, 2)
+    meridians = meridians[(meridians >= min_lon) & (meridians <= max_lon)]
+    if meridians.size:
+        m.drawmeridians(meridians, labels=[0, 0, 0, 0], ax=ax)
+
+    # Wind points and both airports each projected in one batched pyproj call
     x, y = m(lons, lats)
-    m.quiver(x, y, u_components, v_components, color='blue', scale=500, width=0.003)
+    # Denser wind grids than one arrow per QUIVER_SPACING_IN are averaged per cell
+    nx = max(1, int(plot_figsize[0] / QUIVER_SPACING_IN))
+    ny = max(1, int(plot_figsize[1] / QUIVER_SPACING_IN))
+    if len(x) > nx * ny:
+        x, y, quiver_layers = bin_wind_layers(
+            x, y, quiver_layers, (m.llcrnrx, m.urcrnrx, m.llcrnry, m.urcrnry), nx, ny
+        )
+    for u, v, color, alpha in quiver_layers:
+        m.quiver(x, y, u, v, color=color, scale=500, width=0.003, alpha=alpha, ax=ax)
 
-    x_from, y_from = m(from_lon, from_lat)
-    x_to, y_to = m(to_lon, to_lat)
-    m.plot(x_from, y_from, 'ro', markersize=10)
-    m.plot(x_to, y_to, 'go', markersize=10)
-    m.plot([x_from, x_to], [y_from, y_to], 'k-', linewidth=2)
+    (x_from, x_to), (y_from, y_to) = m(np.array([from_lon, to_lon]), np.array([from_lat, to_lat]))
+    m.plot(x_from, y_from, 'ro', markersize=10, ax=ax)
+    m.plot(x_to, y_to, 'go', markersize=10, ax=ax)
+    m.plot([x_from, x_to], [y_from, y_to], 'k-', linewidth=2, ax=ax)
 
     # Remove all axes, ticks, spines, and title
     ax.set_axis_off()
-    plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
+    fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
     # fig.patch.set_visible(False)  # keep white background
 
-    output_file = os.path.join(output_dir, f'wind_data_{airport_names[0]}_to_{airport_names[1]}_FL{level}.png')
-    plt.savefig(output_file, format='png', bbox_inches='tight', pad_inches=0.0, transparent=False, facecolor='white', dpi=600)
-    plt.close(fig)
+    # zlib level 1: encodes several times faster than Pillow's default 6 for a
+    # slightly larger PNG
+    fig.savefig(output_file, format='png', bbox_inches='tight', pad_inches=0.0, transparent=False, facecolor='white', dpi=plot_dpi,
+                pil_kwargs={'compress_level': 1})
+    fig.clf()  # drop the terrain mesh and arrows; the figure itself is kept
     return output_file
 
-def plot_wind_data_augmented(
-    data, airport_coords, airport_names, level, output_dir, magnitude_factor, angle_factor,
-    plot_bbox=None, plot_figsize=None, plot_dpi=None, max_pixels=2000
-):
-    features = data['features']
-    lons = []
-    lats = []
-    u_components = []
-    v_components = []
-    u_components_augmented = []
-    v_components_augmented = []
-    augmentation_texts = []
-    augmentation_coords = []
-
-    for feature in features:
-        if 'geometry' in feature and 'coordinates' in feature['geometry']:
-            lon, lat = feature['geometry']['coordinates']
-            if 'properties' in feature and 'wdir' in feature['properties'] and 'wspd' in feature['properties']:
-                wdir = feature['properties']['wdir']
-                wspd = feature['properties']['wspd']
-                try:
-                    wdir = float(wdir)
-                    wspd = float(wspd)
-                except ValueError:
-                    continue
-                lons.append(lon)
-                lats.append(lat)
-                rad = np.deg2rad(wdir)
-                u = wspd * np.sin(rad)
-                v = wspd * np.cos(rad)
-                u_components.append(u)
-                v_components.append(v)
-                wspd_augmented = wspd * magnitude_factor
-                angle_augmentation = wspd * angle_factor
-                wdir_augmented = wdir + angle_augmentation
-                rad_augmented = np.deg2rad(wdir_augmented)
-                u_augmented = wspd_augmented * np.sin(rad_augmented)
-                v_augmented = wspd_augmented * np.cos(rad_augmented)
-                u_components_augmented.append(u_augmented)
-                v_components_augmented.append(v_augmented)
-                heading_diff = wdir_augmented - wdir
-                wspd_diff = wspd_augmented - wspd
-                diff_text = f"{heading_diff:+.1f}° / {wspd_diff:+.1f}kt"
-                augmentation_texts.append(diff_text)
-                augmentation_coords.append((lon, lat))
+def plot_output(output_dir, file_name):
+    # Render into memory for callers that upload the PNG directly
+    if output_dir is None:
+        return io.BytesIO()
+    return os.path.join(output_dir, file_name)
 
-    from_lon, from_lat = airport_coords[0]
-    to_lon, to_lat = airport_coords[1]
-    if plot_bbox is not None:
-        min_lon, max_lon, min_lat, max_lat = plot_bbox
+def plot_wind_data(
+    data, airport_coords, airport_names, level, output_dir,
+    plot_bbox=None, plot_figsize=None, plot_dpi=None, max_pixels=2000, terrain=None, detail=None,
+    augmentation=None
+):
+    """
+    Wind arrows for one level. With augmentation=(magnitude_factor, angle_factor)
+    the augmented winds are drawn in red over the faded originals.
+    """
+    lons, lats, wdir, wspd = wind_arrays(data['features'])
+    rad = np.deg2rad(wdir)
+    u_components = wspd * np.sin(rad)
+    v_components = wspd * np.cos(rad)
+
+    if augmentation is None:
+        quiver_layers = [(u_components, v_components, 'blue', None)]
+        file_name = f'wind_data_{airport_names[0]}_to_{airport_names[1]}_FL{level}.png'
     else:
-        min_lon = min(from_lon, to_lon) - padding
-        max_lon = max(from_lon, to_lon) + padding
-        min_lat = min(from_lat, to_lat) - padding
-        max_lat = max(from_lat, to_lat) + padding
-
-    # Get consistent figure size and dpi
-    if plot_figsize is None or plot_dpi is None:
-        plot_figsize, plot_dpi = get_plot_dimensions(min_lon, max_lon, min_lat, max_lat, max_pixels=max_pixels)
-
-    try:
-        lon_grid, lat_grid, elevation = fetch_terrain_data(min_lon, max_lon, min_lat, max_lat)
-    except Exception:
-        lon_grid, lat_grid, elevation = None, None, None
-
-    plt.rcParams['svg.fonttype'] = 'none'
-    fig = plt.figure(figsize=plot_figsize, dpi=plot_dpi)
-    ax = fig.add_axes([0, 0, 1, 1])  # full-figure axes, no border
-
-    # Set white background
-    fig.patch.set_facecolor('white')
-    ax.set_facecolor('white')
-
-    m = Basemap(projection='merc', llcrnrlat=min_lat, urcrnrlat=max_lat,
-                llcrnrlon=min_lon, urcrnrlon=max_lon, resolution='i', ax=ax)
-
-    if lon_grid is not None and lat_grid is not None and elevation is not None:
-        elev_masked = np.ma.masked_invalid(elevation)
-        x_terr, y_terr = m(lon_grid, lat_grid)
-        vmin = np.nanmin(elev_masked)
-        vmax = np.nanmax(elev_masked)
-        vmin = max(0, vmin)
-        vmax = max(vmax, vmin + 1)
-        m.pcolormesh(x_terr, y_terr, elev_masked, cmap='terrain', shading='auto', alpha=0.6, vmin=vmin, vmax=vmax)
-
-    m.drawcoastlines(linewidth=0.5)
-    m.drawcountries(linewidth=0.5)
-    m.drawstates(linewidth=0.3)
-    m.drawparallels(np.arange(int(min_lat), int(max_lat) + 1, 2), labels=[0, 0, 0, 0])
-    m.drawmeridians(np.arange(int(min_lon), int(max_lon) + 1, 2), labels=[0, 0, 0, 0])
-
-    x, y = m(lons, lats)
-    m.quiver(x, y, u_components, v_components, color='blue', scale=500, width=0.003, alpha=0.4)
-    m.quiver(x, y, u_components_augmented, v_components_augmented, color='red', scale=500, width=0.003, alpha=0.8)
-
-    # for (lon, lat), diff_text in zip(augmentation_coords, augmentation_texts):
-    #     x_pt, y_pt = m(lon, lat)
-    #     plt.text(
-    #         x_pt + 2000, y_pt + 2000,
-    #         diff_text,
-    #         fontsize=7, color='purple', alpha=0.85,
-    #         ha='left', va='bottom',
-    #         zorder=11,
-    #         bbox=dict(facecolor='white', edgecolor='none', alpha=0.5, boxstyle='round,pad=0.1')
-    #     )
-
-    x_from, y_from = m(from_lon, from_lat)
-    x_to, y_to = m(to_lon, to_lat)
-    m.plot(x_from, y_from, 'ro', markersize=10)
-    m.plot(x_to, y_to, 'go', markersize=10)
-    m.plot([x_from, x_to], [y_from, y_to], 'k-', linewidth=2)
-
-    # Remove all axes, ticks, spines, and title
-    ax.set_axis_off()
-    plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
-    # fig.patch.set_visible(False)  # keep white background
-
-    output_file = os.path.join(output_dir, 
-                              f'wind_data_augmented_{airport_names[0]}_to_{airport_names[1]}_FL{level}.png')
-    plt.savefig(output_file, format='png', bbox_inches='tight', pad_inches=0.0, transparent=False, facecolor='white', dpi=600)
-    plt.close(fig)
+        magnitude_factor, angle_factor = augmentation
+        # Augmented winds: speed scaled, direction rotated in proportion to speed
+        wspd_augmented = wspd * magnitude_factor
+        rad_augmented = np.deg2rad(wdir + wspd * angle_factor)
+        quiver_layers = [
+            (u_components, v_components, 'blue', 0.4),
+            (wspd_augmented * np.sin(rad_augmented), wspd_augmented * np.cos(rad_augmented), 'red', 0.8),
+        ]
+        file_name = f'wind_data_augmented_{airport_names[0]}_to_{airport_names[1]}_FL{level}.png'
+
+    output_file = plot_output(output_dir, file_name)
+    plot_wind_layers(
+        lons, lats, quiver_layers, airport_coords, output_file,
+        plot_bbox=plot_bbox, plot_figsize=plot_figsize, plot_dpi=plot_dpi, max_pixels=max_pixels,
+        terrain=terrain, detail=detail
+    )
+    if output_dir is None:
+        output_file.seek(0)
     return output_file
 
-def generate_wind_plots(departure_icao, arrival_icao, levels, output_dir, max_pixels=2000):
+@lru_cache(maxsize=512)
+def route_geometry(departure_icao, arrival_icao, max_pixels):
+    """
+    Everything about a route that does not depend on the level or the day:
+    airport coordinates and names, padded bbox, wind zoom, map detail and
+    figure size. Memoized per airport pair; missing airports raise ValueError
+    and are not cached.
+    """
     from_airport = get_airport_by_icao(departure_icao)
     to_airport = get_airport_by_icao(arrival_icao)
     if not from_airport:
@@ -374,22 +538,31 @@ def generate_wind_plots(departure_icao, arrival_icao, levels, output_dir, max_pi
     from_lon = float(from_airport['longitude'])
     to_lat = float(to_airport['latitude'])
     to_lon = float(to_airport['longitude'])
-    current_date = datetime.now().astimezone(timezone(timedelta(hours=-8))).strftime("%Y%m%d")
     min_lat = min(from_lat, to_lat) - padding
     max_lat = max(from_lat, to_lat) + padding
     min_lon = min(from_lon, to_lon) - padding
     max_lon = max(from_lon, to_lon) + padding
-    base_url = "https://aviationweather.gov/api/json/ModelWindsJSON"
-    plot_files = []
-    route_distance_km = haversine(from_lat, from_lon, to_lat, to_lon)
+    route_distance_km = float(haversine(from_lat, from_lon, to_lat, to_lon))
     zoom_level = get_zoom_for_distance(route_distance_km)
+    detail = map_detail(route_distance_km)
 
     # Get consistent plot size/aspect for this airport pair
     plot_bbox = (min_lon, max_lon, min_lat, max_lat)
     plot_figsize, plot_dpi = get_plot_dimensions(min_lon, max_lon, min_lat, max_lat, max_pixels=max_pixels)
+    airport_coords = ((from_lon, from_lat), (to_lon, to_lat))
+    airport_names = (from_airport['icao'], to_airport['icao'])
+    return airport_coords, airport_names, plot_bbox, zoom_level, detail, plot_figsize, plot_dpi
+
+WIND_API_URL = "https://aviationweather.gov/api/json/ModelWindsJSON"
 
-    for level in levels:
-        params = {
+def fetch_route_winds(route, levels):
+    # Per-level wind grids for today's 00Z run plus the terrain, fetched concurrently
+    _, _, plot_bbox, zoom_level, detail, _, _ = route
+    min_lon, max_lon, min_lat, max_lat = plot_bbox
+    current_date = datetime.now().astimezone(timezone(timedelta(hours=-8))).strftime("%Y%m%d")
+
+    def params_for_level(level):
+        return {
             "wrap": "true",
             "zoom": zoom_level,
             "model": "gfaak",
@@ -400,131 +573,166 @@ def generate_wind_plots(departure_icao, arrival_icao, levels, output_dir, max_pi
             "tref": "00",
             "fhr": "00"
         }
-        response_data = make_request_with_params(base_url, params)
-        airport_coords = [(from_lon, from_lat), (to_lon, to_lat)]
-        airport_names = [from_airport['icao'], to_airport['icao']]
+
+    return fetch_levels_and_terrain(WIND_API_URL, params_for_level, levels, plot_bbox, detail)
+
+def generate_wind_plots(departure_icao, arrival_icao, levels, output_dir, max_pixels=2000, augmentation=None, on_plot=None):
+    """
+    Plot every level of a route. If given, on_plot(level, plot_file) is called
+    as each level finishes and its return value takes the place of the file.
+    """
+    route = route_geometry(departure_icao.upper(), arrival_icao.upper(), max_pixels)
+    airport_coords, airport_names, plot_bbox, _, detail, plot_figsize, plot_dpi = route
+    level_data, terrain = fetch_route_winds(route, levels)
+
+    def plot_level(level, response_data):
         plot_file = plot_wind_data(
             response_data, airport_coords, airport_names, level, output_dir,
-            plot_bbox=plot_bbox, plot_figsize=plot_figsize, plot_dpi=plot_dpi, max_pixels=max_pixels
+            plot_bbox=plot_bbox, plot_figsize=plot_figsize, plot_dpi=plot_dpi, max_pixels=max_pixels,
+            terrain=terrain, detail=detail, augmentation=augmentation
         )
-        plot_files.append(plot_file)
-    return plot_files
+        return plot_file if on_plot is None else on_plot(level, plot_file)
+
+    return map_levels(plot_level, levels, level_data)
 
 def generate_wind_plots_augmented(departure_icao, arrival_icao, levels, output_dir, magnitude_factor, angle_factor, max_pixels=2000):
-    from_airport = get_airport_by_icao(departure_icao)
-    to_airport = get_airport_by_icao(arrival_icao)
-    if not from_airport:
-        raise ValueError(f"Airport with ICAO code '{departure_icao}' not found.")
-    if not to_airport:
-        raise ValueError(f"Airport with ICAO code '{arrival_icao}' not found.")
-    from_lat = float(from_airport['latitude'])
-    from_lon = float(from_airport['longitude'])
-    to_lat = float(to_airport['latitude'])
-    to_lon = float(to_airport['longitude'])
-    current_date = datetime.now().astimezone(timezone(timedelta(hours=-8))).strftime("%Y%m%d")
-    min_lat = min(from_lat, to_lat) - padding
-    max_lat = max(from_lat, to_lat) + padding
-    min_lon = min(from_lon, to_lon) - padding
-    max_lon = max(from_lon, to_lon) + padding
-    route_distance_km = haversine(from_lat, from_lon, to_lat, to_lon)
-    zoom_level = get_zoom_for_distance(route_distance_km)
-    base_url = "https://aviationweather.gov/api/json/ModelWindsJSON"
-    plot_files = []
+    return generate_wind_plots(
+        departure_icao, arrival_icao, levels, output_dir, max_pixels=max_pixels,
+        augmentation=(magnitude_factor, angle_factor)
+    )
 
-    # Get consistent plot size/aspect for this airport pair
-    plot_bbox = (min_lon, max_lon, min_lat, max_lat)
-    plot_figsize, plot_dpi = get_plot_dimensions(min_lon, max_lon, min_lat, max_lat, max_pixels=max_pixels)
+# One S3 client (and its keep-alive connection pool) is shared by every
+# upload and HEAD check
+s3_client = None
 
-    for level in levels:
-        params = {
-            "wrap": "true",
-            "zoom": zoom_level,
-            "model": "gfaak",
-            "level": level,
-            "density": "0",
-            "bbox": f"{min_lon},{min_lat},{max_lon},{max_lat}",
-            "dref": current_date,
-            "tref": "00",
-            "fhr": "00"
-        }
-        response_data = make_request_with_params(base_url, params)
-        airport_coords = [(from_lon, from_lat), (to_lon, to_lat)]
-        airport_names = [from_airport['icao'], to_airport['icao']]
-        plot_file = plot_wind_data_augmented(
-            response_data, airport_coords, airport_names, 
-            level, output_dir, magnitude_factor, angle_factor,
-            plot_bbox=plot_bbox, plot_figsize=plot_figsize, plot_dpi=plot_dpi, max_pixels=max_pixels
+def get_s3_client():
+    global s3_client
+    if s3_client is None:
+        session = boto3.session.Session(
+            aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
+            region_name=os.environ.get('AWS_REGION', 'us-west-2')
         )
-        plot_files.append(plot_file)
-    return plot_files
+        s3_client = session.client('s3', config=Config(
+            max_pool_connections=50,
+            retries={'max_attempts': 3, 'mode': 'adaptive'},
+            tcp_keepalive=True
+        ))
+    return s3_client
 
-def get_s3_client():
-    return boto3.client(
-        's3',
-        aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-        region_name=os.environ.get('AWS_REGION', 'us-west-2')
-    )
+# Plots are well under the multipart threshold and go up in a single PUT;
+# larger files are split into parts uploaded concurrently
+S3_TRANSFER_CONFIG = TransferConfig(multipart_threshold=8 * 1024 * 1024, max_concurrency=8, use_threads=True)
 
 S3_BUCKET = os.environ.get('S3_BUCKET', 'airfq')
-S3_REGION = os.environ.get('AWS_REGION', 'us-west-2')
-
-# --- S3 upload helper ---
-def upload_file_to_s3(file_path, bucket=S3_BUCKET, region=S3_REGION, object_name=None):
-    s3 = get_s3_client()
-    if object_name is None:
-        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
-        random_id = str(uuid.uuid4())[:8]
-        object_name = f"wind-plots/{timestamp}-{random_id}-{os.path.basename(file_path)}"
+S3_URL_EXPIRATION = 604800  # 7 days in seconds, the SigV4 maximum
+
+def plot_url(object_name, bucket=S3_BUCKET):
+    # Pre-signed so the bucket does not have to be public. Signed on every call
+    # (it is local and cheap) so a URL never outlives its expiry or the
+    # credentials' session token
+    return get_s3_client().generate_presigned_url(
+        'get_object', Params={'Bucket': bucket, 'Key': object_name}, ExpiresIn=S3_URL_EXPIRATION
+    )
+
+def s3_object_exists(object_name, bucket=S3_BUCKET):
+    try:
+        get_s3_client().head_object(Bucket=bucket, Key=object_name)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+def upload_png_to_s3(png, object_name, bucket=S3_BUCKET):
+    """Upload an in-memory PNG (file-like object) and return a pre-signed URL"""
     try:
-        s3.upload_file(
-            file_path, bucket, object_name,
+        get_s3_client().upload_fileobj(
+            png, bucket, object_name,
             ExtraArgs={
                 'ContentType': 'image/png',
                 'ContentDisposition': 'inline'
-            }
+            },
+            Config=S3_TRANSFER_CONFIG
         )
-        url = f"https://{bucket}.s3.{region}.amazonaws.com/{object_name}"
-        return url
+        return plot_url(object_name, bucket)
     except Exception as e:
         logging.error(f"Error uploading to S3: {str(e)}")
         raise
 
+# --- Plot cache ---
+# Plots are stored under a key derived from their parameters, so a repeated
+# request is answered with the existing object instead of a new render.
+# The forecast date is part of the key because the wind data changes daily.
+cached_plot_objects = set()
+
+def wind_plot_object_name(departure, arrival, level, magnitude_factor, angle_factor, low_res, augmented):
+    current_date = datetime.now().astimezone(timezone(timedelta(hours=-8))).strftime("%Y%m%d")
+    params = f"{departure.upper()}|{arrival.upper()}|{level}|{magnitude_factor}|{angle_factor}|{low_res}|{augmented}|{current_date}"
+    return f"wind-plots/cache/{hashlib.sha1(params.encode()).hexdigest()}.png"
+
+# Uploads run here so S3 I/O overlaps with rendering the next level
+upload_executor = ThreadPoolExecutor(max_workers=4)
+
 # --- Main API helpers ---
+def generate_and_upload_wind_plots(
+    departure, arrival, levels, magnitude_factor=None, angle_factor=None, low_res=True, augmented=False
+):
+    """
+    Generate wind plots for several levels in memory, upload them to S3, and
+    return their URLs in level order. Each PNG starts uploading as soon as it is
+    rendered. Plots already generated today for the same parameters are reused.
+    """
+    max_pixels = 600 if low_res else 2000
+    if augmented:
+        if magnitude_factor is None:
+            magnitude_factor = 1.5
+        if angle_factor is None:
+            angle_factor = 0.5
+        augmentation = (magnitude_factor, angle_factor)
+    else:
+        magnitude_factor = angle_factor = augmentation = None
+    object_names = {
+        level: wind_plot_object_name(departure, arrival, level, magnitude_factor, angle_factor, low_res, augmented)
+        for level in levels
+    }
+    urls = {}
+    for level, object_name in object_names.items():
+        if object_name in cached_plot_objects or s3_object_exists(object_name):
+            cached_plot_objects.add(object_name)
+            urls[level] = plot_url(object_name)
+    missing = [level for level in levels if level not in urls]
+    if not missing:
+        return [urls[level] for level in levels]
+
+    def upload(level, plot_file):
+        return upload_executor.submit(upload_png_to_s3, plot_file, object_names[level])
+
+    try:
+        uploads = generate_wind_plots(
+            departure, arrival, missing, None, max_pixels=max_pixels,
+            augmentation=augmentation, on_plot=upload
+        )
+        if len(uploads) != len(missing):
+            raise RuntimeError('Failed to generate wind plot')
+        for level, upload_future in zip(missing, uploads):
+            urls[level] = upload_future.result()
+            cached_plot_objects.add(object_names[level])
+        return [urls[level] for level in levels]
+    except Exception as e:
+        logging.error(f"Error in generate_and_upload_wind_plots: {e}")
+        raise
+
 def generate_and_upload_wind_plot(
     departure, arrival, level, magnitude_factor=None, angle_factor=None, low_res=True, augmented=False
 ):
     """
-    Generate a wind plot, upload to S3, delete temp file, and return the S3 URL.
+    Generate a wind plot in memory, upload to S3, and return the S3 URL.
+    Plots already generated today for the same parameters are reused.
     """
-    max_pixels = 600 if low_res else 2000
-    with tempfile.TemporaryDirectory() as temp_dir:
-        try:
-            if augmented:
-                if magnitude_factor is None:
-                    magnitude_factor = 1.5
-                if angle_factor is None:
-                    angle_factor = 0.5
-                plot_files = generate_wind_plots_augmented(
-                    departure, arrival, [level], temp_dir, magnitude_factor, angle_factor, max_pixels=max_pixels
-                )
-            else:
-                plot_files = generate_wind_plots(
-                    departure, arrival, [level], temp_dir, max_pixels=max_pixels
-                )
-            if not plot_files or not os.path.exists(plot_files[0]):
-                raise RuntimeError('Failed to generate wind plot')
-            plot_file = plot_files[0]
-            s3_url = upload_file_to_s3(plot_file)
-            # Delete the file explicitly (though temp_dir will be cleaned up)
-            try:
-                os.remove(plot_file)
-            except Exception:
-                pass
-            return s3_url
-        except Exception as e:
-            logging.error(f"Error in generate_and_upload_wind_plot: {e}")
-            raise
+    return generate_and_upload_wind_plots(
+        departure, arrival, [level], magnitude_factor, angle_factor, low_res, augmented
+    )[0]
 
 if __name__ == '__main__':
     departure = "KSMO"
@@ -0,0 +1,98 @@
+from flask import Blueprint, request, jsonify
+from websockets.sync.client import connect
+import gzip
+import os
+import threading
+import queue
+import time
+import logging
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# /publish: relays flight-unit data to the websocket channel
+publish_bp = Blueprint('publish', __name__)
+
+# Hardcoded WebSocket channel
+HARDCODED_CHANNEL = "wss://s14544.blr1.piesocket.com/v3/kushagarwal?api_key=iJshgbsdZocGM142oxMQ3XxtKzAcfs9sru2aBVuH"
+
+# Vercel's serverless functions are frozen after each response, so a
+# background thread and its socket do not survive there; messages are sent
+# before responding instead
+SERVERLESS = bool(os.environ.get('VERCEL'))
+
+# Messages waiting to be sent; one background thread keeps a single websocket
+# connection open instead of connecting for every /publish request
+publish_queue = queue.Queue(maxsize=1024)
+
+def publish_worker():
+    websocket = None
+    backoff = 1
+    while True:
+        message = publish_queue.get()
+        while True:
+            try:
+                if websocket is None:
+                    websocket = connect(HARDCODED_CHANNEL)
+                websocket.send(message)
+                backoff = 1
+                break
+            except Exception as e:
+                logger.warning(f"Error sending message to websocket: {e}")
+                if websocket is not None:
+                    websocket.close()
+                    websocket = None
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+        # Drain anything the channel sent back so it does not pile up
+        try:
+            while True:
+                response = websocket.recv(timeout=0)
+                logger.debug(f"Received from WS: {response}")
+        except Exception:
+            pass
+
+if not SERVERLESS:
+    threading.Thread(target=publish_worker, daemon=True).start()
+
+def publish_to_channel(message):
+    # Queue the message for the hardcoded websocket channel
+    # Convert message to JSON string if it's not already a string
+    if not isinstance(message, str):
+        message = orjson.dumps(message).decode()
+    if SERVERLESS:
+        # Failures raise and are reported to the caller as a 500
+        with connect(HARDCODED_CHANNEL) as websocket:
+            websocket.send(message)
+        return
+    try:
+        publish_queue.put_nowait(message)
+    except queue.Full:
+        logger.error("Websocket publish queue full, dropping message")
+
+@publish_bp.route('/publish', methods=['POST'])
+def publish():
+    """
+    Accepts JSON with 'data', and initiates publishing 'data' to the hardcoded websocket channel.
+    Example input:
+    {
+        "data": { ... }
+    }
+    """
+    try:
+        if request.content_encoding == 'gzip':
+            # The flight unit gzips its batches when its firmware supports it
+            payload = orjson.loads(gzip.decompress(request.get_data()))
+        else:
+            payload = request.get_json(force=True)
+        data = payload.get('data')
+        if data is None:
+            return jsonify({'error': 'Missing data'}), 400
+
+        # Initiate publishing the data to the hardcoded channel without waiting for completion
+        publish_to_channel(data)
+
+        return jsonify({'status': 'publishing initiated', 'channel': HARDCODED_CHANNEL}), 200
+    except Exception as e:
+        logger.error(f"Error in /publish: {str(e)}")
+        return jsonify({'error': str(e)}), 500
@@ -1,5 +1,5 @@
 import asyncio
-import json
+import orjson
 import websockets
 import random
 import time
@@ -36,27 +36,6 @@ class FlightDataGenerator:
         self._curvature = random.uniform(-0.002, 0.002)  # radians per update
         self._step_count = 0
 
-        # Store previous lat/lon for heading calculation
-        self._prev_lat = self.lat
-        self._prev_lon = self.lon
-
-    def _calculate_heading(self, lat1, lon1, lat2, lon2):
-        """
-        Calculate the heading (initial bearing) from (lat1, lon1) to (lat2, lon2).
-        All args in degrees. Returns heading in degrees (0 = North, 90 = East).
-        """
-        # Convert to radians
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        dlon_rad = math.radians(lon2 - lon1)
-        x = math.sin(dlon_rad) * math.cos(lat2_rad)
-        y = math.cos(lat1_rad) * math.sin(lat2_rad) - \
-            math.sin(lat1_rad) * math.cos(lat2_rad) * math.cos(dlon_rad)
-        initial_bearing = math.atan2(x, y)
-        # Convert from radians to degrees and normalize
-        bearing_deg = (math.degrees(initial_bearing) + 360) % 360
-        return bearing_deg
-
     def generate_data(self):
         # Optionally, allow speed_factor to drift a little over time
         self.speed_factor += random.uniform(-0.02, 0.02)
@@ -68,19 +47,16 @@ class FlightDataGenerator:
         # Simulate smooth movement along a curved path
         # The direction changes slowly over time to create a gentle curve
         direction = self._base_direction + self._curvature * self._step_count
-        delta_lat = self._step_size * math.cos(direction)
-        delta_lon = self._step_size * math.sin(direction)
-        new_lat = self.lat + delta_lat
-        new_lon = self.lon + delta_lon
-
-        # Calculate heading based on movement from previous to new position
-        heading = self._calculate_heading(self.lat, self.lon, new_lat, new_lon)
-
-        # Update position and step count
-        self._prev_lat = self.lat
-        self._prev_lon = self.lon
-        self.lat = new_lat
-        self.lon = new_lon
+        # The heading is the ground bearing of this step (0 = North, 90 = East).
+        # The step is in raw lat/lon degrees, and a degree of longitude shrinks
+        # by cos(lat) on the ground, so it is not simply `direction`
+        self.heading = math.degrees(math.atan2(
+            math.sin(direction) * math.cos(math.radians(self.lat)), math.cos(direction)
+        )) % 360.0
+        self.lat += self._step_size * math.cos(direction)
+        self.lon += self._step_size * math.sin(direction)
+
+        # Update step count
         self._step_count += 1
 
         # Random walk for other parameters with low variations
@@ -95,9 +71,6 @@ class FlightDataGenerator:
         self.track %= 360
         self.humidity = max(10.0, min(90.0, self.humidity))
 
-        # The heading now reflects the actual direction of movement
-        self.heading = heading
-
         return {
             "flightId": self.flight_id,
             "oat": self.oat,
@@ -123,24 +96,20 @@ flight_generators = [
     FlightDataGenerator(flight_id="N400JW", lat=41.8781, lon=-87.6298)   # Chicago
 ]
 
+# Each flight used to be sent 0.1 s apart plus 0.1 s per round, so this keeps
+# the same per-flight update rate (and on-map speed)
+UPDATE_INTERVAL = 0.1 * (len(flight_generators) + 1)
+
 async def broadcast_flight_data():
     while True:
-        # Generate data for all flights
-        flight_data_list = [gen.generate_data() for gen in flight_generators]
-        # Send each flight's data to all connected clients
-        for flight_data in flight_data_list:
-            message = json.dumps(flight_data)
-            # Send to all clients, remove any that are closed
-            disconnected = set()
-            for ws in connected_clients:
-                try:
-                    await ws.send(message)
-                except websockets.exceptions.ConnectionClosed:
-                    disconnected.add(ws)
-            connected_clients.difference_update(disconnected)
-            await asyncio.sleep(0.1)
-        # Wait before next update for all flights
-        await asyncio.sleep(0.1)
+        # All flights go out as one JSON array per tick: one frame per client
+        # instead of one per flight. orjson serializes in C; decoded so clients
+        # still get text frames
+        message = orjson.dumps([gen.generate_data() for gen in flight_generators]).decode()
+        # Queued on every open connection without waiting on slow clients;
+        # closed ones are skipped and removed by their handler
+        websockets.broadcast(connected_clients, message)
+        await asyncio.sleep(UPDATE_INTERVAL)
 
 # WebSocket handler
 async def flight_data_server(websocket):
@@ -7,7 +7,9 @@ async def send_hi_periodically():
     uri = "wss://s14548.nyc1.piesocket.com/v3/snap?api_key=S3mOqwO98bva0NAXrXIlhAWVh0RKBaWL0HNsvkdS"
     
     try:
-        async with websockets.connect(uri) as websocket:
+        # Keepalive is left to protocol pings; the "hi" messages below are the
+        # test traffic the Snap lens listens for on the channel, not keepalives
+        async with websockets.connect(uri, ping_interval=20, ping_timeout=10) as websocket:
             # Send "hi" message every 2 seconds
             while True:
                 await websocket.send("hi")
@@ -21,10 +23,9 @@ async def main():
     # Start the WebSocket communication task
     task = asyncio.create_task(send_hi_periodically())
     
-    # Keep the main coroutine running until interrupted
+    # Wait on the task itself until it ends or the program is interrupted
     try:
-        while True:
-            await asyncio.sleep(1)
+        await task
     except asyncio.CancelledError:
         task.cancel()
         print("Program terminated")
@@ -1,11 +1,15 @@
 import pandas as pd
 import numpy as np
+import matplotlib
+# Output is only ever written to files; skip the GUI backend probe
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import contextily as ctx
 from matplotlib.collections import LineCollection
 from matplotlib.colors import Normalize
 import os
 import argparse
+from functools import lru_cache
 
 # For airport boundary plotting
 from matplotlib.patches import Polygon
@@ -14,6 +18,7 @@ from matplotlib.patches import Polygon
 parser = argparse.ArgumentParser(description="Parse and plot flight data.")
 parser.add_argument('--input', default='flight.csv', help="Input CSV filename (e.g., airspeed.csv)")
 parser.add_argument('--show-ksmo-cords', action='store_true', help="Print KSMO boundary coordinates and exit")
+parser.add_argument('--force', action='store_true', help="Regenerate outputs even if they are newer than the input")
 args = parser.parse_args()
 
 input_csv = args.input
@@ -21,6 +26,12 @@ input_csv = args.input
 outdir = os.path.splitext(os.path.basename(input_csv))[0]
 os.makedirs(outdir, exist_ok=True)
 
+# Simplify and chunk long line paths; the time series plots have one vertex per sample
+plt.style.use('fast')
+
+# Keep basemap tiles on disk so re-running on the same flight does not download them again
+ctx.set_cache_dir(os.path.join(os.path.expanduser('~'), '.cache', 'airfq', 'tiles'))
+
 # Define KSMO (Santa Monica Airport) boundary using precise GeoJSON MultiPolygon coordinates
 # (from the provided geojson for Santa Monica Airport)
 ksmo_boundary_coords = [
@@ -536,11 +547,26 @@ if args.show_ksmo_cords:
                 print(coord)
     exit(0)
 
-# Read CSV files
-df = pd.read_csv(input_csv).dropna(subset=['latitude', 'longitude', 'airspeed'])
+# Nothing to do if every output is newer than both the input CSV and this script
+output_files = [os.path.join(outdir, name) for name in (
+    'ground_speed_track.csv', 'airspeed_elevation.csv',
+    'gps_track_with_elevation.png', 'gps_track_with_airspeed.png',
+    'maps_subplot.png', 'speed_and_track_over_time.png',
+)]
+if not args.force and all(os.path.exists(f) for f in output_files):
+    newest_input = max(os.path.getmtime(input_csv), os.path.getmtime(os.path.abspath(__file__)))
+    if newest_input < min(os.path.getmtime(f) for f in output_files):
+        print(f"Outputs in {outdir}/ are up to date (use --force to regenerate)")
+        exit(0)
 
-# Convert types
-df[['latitude', 'longitude', 'elevation', 'airspeed']] = df[['latitude', 'longitude', 'elevation', 'airspeed']].astype(float)
+# Read CSV files, parsing only the columns used below straight into their types.
+# Positions stay float64: float32 would round them to about a metre, which the
+# 1 Hz ground speed cannot tolerate
+df = pd.read_csv(
+    input_csv,
+    usecols=['time', 'time_ms', 'latitude', 'longitude', 'elevation', 'airspeed'],
+    dtype={'latitude': 'float64', 'longitude': 'float64', 'elevation': 'float32', 'airspeed': 'float32'},
+).dropna(subset=['latitude', 'longitude', 'airspeed'])
 
 # Extract timestamps
 full_time = pd.to_datetime(df['time'], format='%H:%M:%S') + pd.to_timedelta(df['time_ms'], unit='ms')
@@ -584,13 +610,11 @@ df[['timestamp', 'airspeed', 'elevation']].to_csv(os.path.join(outdir, 'airspeed
 # Rolling average (5-second batch) for ground speed
 gps_df_clean['ground_speed_avg'] = gps_df_clean['ground_speed_mps'].rolling(window=5, min_periods=1).mean()
 
-# For track, use circular mean so that wraparound at 180/-180 is handled correctly
-def circular_mean_deg(series):
-    radians = np.deg2rad(series)
-    mean_angle = np.arctan2(np.mean(np.sin(radians)), np.mean(np.cos(radians)))
-    return np.rad2deg(mean_angle)
-
-gps_df_clean['track_avg'] = gps_df_clean['track_deg'].rolling(window=5, min_periods=1).apply(circular_mean_deg, raw=False)
+# For track, use circular mean so that wraparound at 180/-180 is handled correctly:
+# average the unit vectors of the window in one rolling pass, then take the angle
+track_avg_rad = np.deg2rad(gps_df_clean['track_deg'])
+track_vec = pd.DataFrame({'sin': np.sin(track_avg_rad), 'cos': np.cos(track_avg_rad)}).rolling(window=5, min_periods=1).mean()
+gps_df_clean['track_avg'] = np.rad2deg(np.arctan2(track_vec['sin'], track_vec['cos']))
 
 # Clean airspeed for time series plot: drop NaN, use rolling average of previous 15 timestamps
 airspeed_clean = df[['timestamp', 'airspeed']].dropna(subset=['airspeed']).copy()
@@ -617,6 +641,19 @@ def plot_airport_boundary(ax, multipolygon_coords, color='white', linewidth=1, a
             polygon = Polygon(poly_coords, closed=True, fill=False, edgecolor=color, linewidth=linewidth, alpha=alpha, zorder=10)
             ax.add_patch(polygon)
 
+# The maps are 12" (22" for the pair) of faded imagery under a 3 pt line, so
+# 150 dpi is plenty; a few thousand segments are also more than they can show
+MAP_DPI = 150
+MAX_TRACK_SEGMENTS = 2000
+
+# Fetched and warped to lon/lat once per extent and shared by every map below,
+# which all cover the same track
+@lru_cache(maxsize=None)
+def basemap_image(extent, zoom):
+    west, east, south, north = extent
+    img, ext = ctx.bounds2img(west, south, east, north, zoom=zoom, source=ctx.providers.Esri.WorldImagery, ll=True)
+    return ctx.warp_tiles(img, ext, t_crs='EPSG:4326')
+
 # Plot maps with heatmaps and high-resolution terrain basemaps with opacity
 def plot_map(df, column, title, cmap, outdir, show_airport=True, ax=None):
     # If ax is None, create a new figure and axis
@@ -624,11 +661,13 @@ def plot_map(df, column, title, cmap, outdir, show_airport=True, ax=None):
     if ax is None:
         fig, ax = plt.subplots(figsize=(12,12))
         close_fig = True
-    points = np.array([df['longitude'], df['latitude']]).T.reshape(-1,1,2)
-    segments = np.concatenate([points[:-1], points[1:]], axis=1)
+    track = df.iloc[::-(-len(df) // MAX_TRACK_SEGMENTS)]
+    # (N-1, 2, 2) segments as a view of consecutive point pairs, no copies
+    points = track[['longitude', 'latitude']].to_numpy()
+    segments = np.lib.stride_tricks.sliding_window_view(points, 2, axis=0).transpose(0, 2, 1)
     norm = Normalize(vmin=df[column].min(), vmax=df[column].max())
     lc = LineCollection(segments, cmap=cmap, norm=norm, linewidth=3)
-    lc.set_array(df[column])
+    lc.set_array(track[column])
     ax.add_collection(lc)
     ax.autoscale()
     ax.set_facecolor('black')
@@ -637,13 +676,11 @@ def plot_map(df, column, title, cmap, outdir, show_airport=True, ax=None):
     lon_min, lon_max = df['longitude'].min(), df['longitude'].max()
     zoom = estimate_zoom_level(lat_min, lat_max, lon_min, lon_max)
     # Use high-resolution ESRI World Imagery as terrain basemap with opacity
-    ctx.add_basemap(
-        ax,
-        crs='EPSG:4326',
-        zoom=zoom,
-        source=ctx.providers.Esri.WorldImagery,
-        alpha=0.3  # set opacity for basemap
-    )
+    extent = tuple(ax.axis())
+    img, img_extent = basemap_image(extent, zoom)
+    ax.imshow(img, extent=img_extent, interpolation='bilinear', alpha=0.3)  # set opacity for basemap
+    ax.axis(extent)
+    ctx.add_attribution(ax, ctx.providers.Esri.WorldImagery.attribution)
     # Show KSMO boundary if requested
     if show_airport:
         plot_airport_boundary(ax, ksmo_boundary_coords)
@@ -651,7 +688,7 @@ def plot_map(df, column, title, cmap, outdir, show_airport=True, ax=None):
     ax.set_title(title)
     if close_fig:
         outpath = os.path.join(outdir, f'{title.replace(" ", "_").lower()}.png')
-        plt.savefig(outpath, dpi=300)
+        plt.savefig(outpath, dpi=MAP_DPI)
         plt.close(fig)
     return ax
 
@@ -667,7 +704,7 @@ axes[0].set_title('GPS Track with Elevation')
 axes[1].set_title('GPS Track with Airspeed')
 plt.tight_layout()
 outpath = os.path.join(outdir, 'maps_subplot.png')
-plt.savefig(outpath, dpi=300)
+plt.savefig(outpath, dpi=MAP_DPI)
 plt.close(fig)
 
 # Plot speed, heading, and (airspeed - ground speed) over time (with mean offset removed)